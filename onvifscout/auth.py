@@ -6,18 +6,15 @@ from itertools import product
 from typing import List, Tuple
 
 import requests
-import urllib3
 from requests.auth import HTTPDigestAuth
 
 from .models import ONVIFDevice
-from .utils import Logger
-
-# Disable SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from .utils import Logger, disable_insecure_warnings
 
 
 class ONVIFAuthProbe:
     def __init__(self, max_workers: int = 5, timeout: int = 5, retries: int = 2):
+        disable_insecure_warnings()
         self.max_workers = max_workers
         self.timeout = timeout
         self.retries = retries
@@ -27,17 +24,18 @@ class ONVIFAuthProbe:
             "tds": "http://www.onvif.org/ver10/device/wsdl",
             "tt": "http://www.onvif.org/ver10/schema",
         }
-        self.soap_template = """<?xml version="1.0" encoding="UTF-8"?>
+        self.soap_template = b"""<?xml version="1.0" encoding="UTF-8"?>
 <s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope">
     <s:Body xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema">
         <GetDeviceInformation xmlns="http://www.onvif.org/ver10/device/wsdl"/>
     </s:Body>
 </s:Envelope>"""
 
-    def _verify_response_content(self, response_text: str) -> bool:
+    def _verify_response_content(self, response_content: bytes) -> bool:
         """Verify that the response is a valid ONVIF response"""
         try:
-            root = ET.fromstring(response_text)
+            # Parse the raw bytes; decoding to text first is wasted work
+            root = ET.fromstring(response_content)
 
             # Check for authentication failure indicators
             fault = root.find(".//s:Fault", self._namespaces)
@@ -49,14 +47,14 @@ class ONVIFAuthProbe:
 
             # Check for common error patterns
             if any(
-                error in response_text
+                error in response_content
                 for error in [
-                    "Sender",
-                    "NotAuthorized",
-                    "AccessDenied",
-                    "AuthenticationFailed",
-                    "InvalidArgVal",
-                    "NotFound",
+                    b"Sender",
+                    b"NotAuthorized",
+                    b"AccessDenied",
+                    b"AuthenticationFailed",
+                    b"InvalidArgVal",
+                    b"NotFound",
                 ]
             ):
                 return False
@@ -106,7 +104,7 @@ class ONVIFAuthProbe:
                 )
 
                 if response.status_code == 200 and self._verify_response_content(
-                    response.text
+                    response.content
                 ):
                     return True, "Digest"
                 elif response.status_code == 401:  # Unauthorized
@@ -125,7 +123,7 @@ class ONVIFAuthProbe:
                     )
 
                     if response.status_code == 200 and self._verify_response_content(
-                        response.text
+                        response.content
                     ):
                         return True, "Basic"
                     elif response.status_code == 401:  # Unauthorized
@@ -1,6 +1,7 @@
 # device_contexts.py
+import functools
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 
 @dataclass
@@ -210,30 +211,62 @@ DEVICE_CONTEXTS = {
     ),
 }
 
+# Lowercased (keyword, vendor key) pairs in DEVICE_CONTEXTS order, so vendor
+# detection is a single pass over a flat table instead of one scan per context
+_KEYWORD_INDEX = tuple(
+    (keyword.lower(), key)
+    for key, context in DEVICE_CONTEXTS.items()
+    for keyword in context.keywords
+)
+
+
+def _merge_paths(context: DeviceContext) -> Tuple[str, ...]:
+    """Merge priority, vendor and generic paths, dropping duplicates in order"""
+    paths = list(context.priority_paths) + list(context.paths)
+    if context is not DEVICE_CONTEXTS["generic"]:
+        paths.extend(DEVICE_CONTEXTS["generic"].paths)
+    return tuple(dict.fromkeys(paths))
+
+
+# Contexts are static, so the merged snapshot path list is built once per vendor
+_MERGED_PATHS = {
+    context.name.lower(): _merge_paths(context) for context in DEVICE_CONTEXTS.values()
+}
+
+
+@functools.lru_cache(maxsize=256)
+def get_context(device_name: str) -> DeviceContext:
+    """Get the device context for a device name (cached, contexts are static)"""
+    if not device_name:
+        return DEVICE_CONTEXTS["generic"]
+
+    device_name = device_name.lower()
+    for keyword, key in _KEYWORD_INDEX:
+        if keyword in device_name:
+            return DEVICE_CONTEXTS[key]
+
+    return DEVICE_CONTEXTS["generic"]
+
 
 class DeviceContextManager:
     @staticmethod
     def get_context(device_name: str) -> DeviceContext:
         """Get the appropriate device context based on device name"""
-        if not device_name:
-            return DEVICE_CONTEXTS["generic"]
-
-        for context in DEVICE_CONTEXTS.values():
-            if context.matches(device_name):
-                return context
-
-        return DEVICE_CONTEXTS["generic"]
+        return get_context(device_name)
 
     @staticmethod
-    def get_all_paths(context: DeviceContext) -> List[str]:
+    def get_all_paths(context: DeviceContext) -> Tuple[str, ...]:
         """Get all paths including generic ones"""
-        paths = []
-        # Add priority paths first
-        if context.priority_paths:
-            paths.extend(context.priority_paths)
-        # Add regular paths
-        paths.extend(context.paths)
-        # Add generic paths if not generic context
-        if context.name.lower() != "generic":
-            paths.extend(DEVICE_CONTEXTS["generic"].paths)
-        return list(dict.fromkeys(paths))  # Remove duplicates while preserving order
+        merged = _MERGED_PATHS.get(context.name.lower())
+        if merged is None:
+            merged = _merge_paths(context)
+        return merged
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def candidate_tuples(
+        context_name: str, ports: Tuple[int, ...]
+    ) -> Tuple[Tuple[str, str], ...]:
+        """Get (port, path) snapshot probe pairs, with ports pre-stringified"""
+        paths = _MERGED_PATHS.get(context_name.lower(), _MERGED_PATHS["generic"])
+        return tuple((str(port), path) for port in ports for path in paths)
@@ -101,3 +101,7 @@ def _save_discovered_devices(
                 Logger.error(f"Failed to save device {device.address}")
         except Exception as e:
             Logger.error(f"Error saving device {device.address}: {str(e)}")
+
+    # Write all saved devices at once
+    if not manager.flush():
+        Logger.error("Failed to write saved devices")
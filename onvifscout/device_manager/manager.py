@@ -1,13 +1,61 @@
+import atexit
 import contextlib
 import fcntl
 import json
+import threading
+import weakref
 from datetime import datetime
 from pathlib import Path
-from typing import Callable, ContextManager, Dict, List, Optional
+from typing import Callable, ContextManager, Dict, List, Optional, Tuple, Union
 
 from ..models import ONVIFCapabilities, ONVIFDevice
 from ..utils import Logger
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+# Journal size (bytes) above which it is folded back into devices.json
+JOURNAL_COMPACT_SIZE = 1024 * 1024
+
+# Delay (seconds) after the last staged device before pending writes are flushed
+FLUSH_DELAY = 0.5
+
+
+# Managers with possibly staged writes, flushed once at interpreter exit. Held
+# weakly so registering for the exit flush doesn't keep managers alive.
+_LIVE_MANAGERS: "weakref.WeakSet[DeviceManager]" = weakref.WeakSet()
+
+
+def _flush_live_managers() -> None:
+    """Flush staged writes of every manager still alive at exit"""
+    for manager in list(_LIVE_MANAGERS):
+        manager.flush()
+
+
+atexit.register(_flush_live_managers)
+
+
+def _dumps(data: Dict, indent: bool = True) -> bytes:
+    """Serialize devices data, using orjson when available"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    if indent:
+        return json.dumps(data, indent=2).encode("utf-8")
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(data: bytes) -> Dict:
+    """Parse devices data, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 class DeviceManager:
     """Manages ONVIF device information persistence and retrieval"""
@@ -20,7 +68,21 @@ class DeviceManager:
             self.config_dir = Path.home() / ".onvifscout"
 
         self.devices_file = self.config_dir / "devices.json"
+        # Append-only log of changes not yet compacted into devices.json
+        self.journal_file = self.config_dir / "devices.log"
+        # Parsed devices, reused until devices.json or the journal changes. The
+        # dict is never mutated once published, only replaced, so readers can
+        # iterate it while the flush timer thread writes.
+        self._cache: Optional[Dict[str, Dict]] = None
+        self._cache_key: Optional[Tuple[int, int, int]] = None
+        # Staged device entries waiting for the debounced flush
+        self._pending: Dict[str, Dict] = {}
+        # Staged last_seen refreshes for devices that are otherwise unchanged
+        self._pending_seen: Dict[str, str] = {}
+        self._pending_lock = threading.RLock()
+        self._flush_timer: Optional[threading.Timer] = None
         self._ensure_config_dir()
+        _LIVE_MANAGERS.add(self)
 
     @contextlib.contextmanager
     def _file_lock(self) -> ContextManager:  # type: ignore
@@ -40,39 +102,111 @@ class DeviceManager:
         """Ensure configuration directory exists"""
         self.config_dir.mkdir(parents=True, exist_ok=True)
 
-    def _atomic_write(self, update_func: Callable[[Dict[str, Dict]], bool]) -> bool:
+    def _atomic_write(
+        self,
+        update_func: Callable[[Dict[str, Dict]], Union[Dict, List[Dict], None]],
+    ) -> bool:
         """
-        Atomically update the devices file using the provided update function.
+        Atomically update the devices store using the provided update function.
+
+        The change is appended to the journal; devices.json is only rewritten
+        when the journal grows past JOURNAL_COMPACT_SIZE.
 
         Args:
-            update_func: Function that takes the current
-            devices dict and returns True if updated
+            update_func: Function that takes the current devices dict, applies
+            the update and returns the journal entry (or entries) describing
+            it, or None if nothing was updated
 
         Returns:
             bool: True if update was successful, False otherwise
         """
-        temp_file = self.devices_file.with_suffix(".tmp")
         try:
             with self._file_lock():
-                # Load current devices
-                devices = self.load_devices()
+                # Load current devices into a copy so the cache is swapped in
+                # whole rather than changed under concurrent readers
+                devices = dict(self.load_devices())
 
                 # Apply update
-                if not update_func(devices):
+                entries = update_func(devices)
+                if not entries:
                     return False
-
-                # Write updated data atomically
-                with open(temp_file, "w") as f:
-                    json.dump(devices, f, indent=2)
-
-                temp_file.replace(self.devices_file)
+                if isinstance(entries, dict):
+                    entries = [entries]
+
+                with open(self.journal_file, "ab") as f:
+                    f.write(
+                        b"".join(
+                            _dumps(entry, indent=False) + b"\n" for entry in entries
+                        )
+                    )
+
+                if self.journal_file.stat().st_size > JOURNAL_COMPACT_SIZE:
+                    self._compact(devices)
+
+                # Devices staged since the load must stay visible in the cache
+                with self._pending_lock:
+                    self._merge_pending(devices)
+                    self._cache = devices
+                    self._cache_key = self._state_key()
                 return True
 
         except Exception as e:
             Logger.error(f"Failed to update devices file: {str(e)}")
+            self._invalidate_cache()
+            return False
+
+    def _compact(self, devices: Dict[str, Dict]) -> None:
+        """Write devices atomically to devices.json and truncate the journal"""
+        temp_file = self.devices_file.with_suffix(".tmp")
+        try:
+            with open(temp_file, "wb") as f:
+                f.write(_dumps(devices))
+            temp_file.replace(self.devices_file)
+        finally:
             if temp_file.exists():
                 temp_file.unlink()
-            return False
+        # Entries are idempotent, so a crash before truncation only replays
+        # changes that are already in devices.json
+        self.journal_file.write_bytes(b"")
+
+    def _apply_journal_entry(self, devices: Dict[str, Dict], entry: Dict) -> None:
+        """Apply a single journal entry to the devices dict"""
+        op = entry.get("op")
+        address = entry.get("addr")
+        if op == "put":
+            devices[address] = entry["data"]
+        elif op == "upd":
+            if address in devices:
+                devices[address].update(entry["fields"])
+        elif op == "del":
+            devices.pop(address, None)
+        else:
+            Logger.debug(f"Ignoring unknown journal operation: {op}")
+
+    def _replay_journal(self, devices: Dict[str, Dict]) -> None:
+        """Replay journal entries on top of the devices loaded from disk"""
+        if not self.journal_file.exists():
+            return
+        for line in self.journal_file.read_bytes().splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._apply_journal_entry(devices, _loads(line))
+            except Exception as e:
+                # A torn final line from an interrupted append is skipped
+                Logger.debug(f"Skipping invalid journal entry: {str(e)}")
+
+    def _state_key(self) -> Tuple[int, int, int]:
+        """Return a key identifying the on-disk state of the devices store"""
+        try:
+            devices_mtime = self.devices_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            devices_mtime = -1
+        try:
+            journal_stat = self.journal_file.stat()
+            return devices_mtime, journal_stat.st_mtime_ns, journal_stat.st_size
+        except FileNotFoundError:
+            return devices_mtime, -1, -1
 
     def _serialize_capabilities(
         self, capabilities: Optional[ONVIFCapabilities]
@@ -82,7 +216,7 @@ class DeviceManager:
             return None
 
         return {
-            "services": list(capabilities.services) if capabilities.services else [],
+            "services": sorted(capabilities.services) if capabilities.services else [],
             "analytics": dict(capabilities.analytics),
             "device": dict(capabilities.device),
             "events": dict(capabilities.events),
@@ -120,7 +254,10 @@ class DeviceManager:
             "name": device.name,
             "urls": device.urls,
             "types": device.types,
-            "valid_credentials": device.valid_credentials,
+            # Lists, as they come back from JSON, so stored entries compare equal
+            "valid_credentials": [
+                list(cred) for cred in device.valid_credentials or []
+            ],
             "capabilities": self._serialize_capabilities(device.capabilities),
             "last_seen": (last_seen or datetime.now()).isoformat(),
             "description": description or getattr(device, "description", ""),
@@ -157,8 +294,15 @@ class DeviceManager:
         group: str = "default",
         tags: List[str] = None,
         description: str = None,
+        flush_immediately: bool = False,
     ) -> bool:
-        """Add or update a device"""
+        """
+        Add or update a device.
+
+        The device is staged in memory and written by a debounced flush
+        shortly after the last change (and at exit), so saving many devices
+        costs a single write. Pass flush_immediately=True to write now.
+        """
         device_data = self._serialize_device(
             device, group=group, tags=tags, description=description
         )
@@ -166,19 +310,143 @@ class DeviceManager:
         if not self._validate_device_data(device_data):
             raise ValueError("Invalid device data")
 
-        def update_devices(devices: Dict[str, Dict]) -> bool:
-            devices[device.address] = device_data
+        if self._is_unchanged(device_data):
+            # Only last_seen moved, persist it as a small journal update
+            Logger.debug(f"Device {device.address} unchanged, refreshing last_seen")
+            self._stage_last_seen(device_data["address"], device_data["last_seen"])
+        else:
+            self._stage_device(device_data)
+        if flush_immediately:
+            return self.flush()
+        return True
+
+    def _stage_device(self, device_data: Dict) -> None:
+        """Stage a device entry and (re)schedule the debounced flush"""
+        address = device_data["address"]
+        with self._pending_lock:
+            self._pending[address] = device_data
+            self._pending_seen.pop(address, None)
+            if self._cache is not None:
+                self._cache = {**self._cache, address: device_data}
+            self._schedule_flush()
+
+    def _stage_last_seen(self, address: str, last_seen: str) -> None:
+        """Stage a last_seen refresh and (re)schedule the debounced flush"""
+        with self._pending_lock:
+            if address in self._pending:
+                self._pending[address] = {
+                    **self._pending[address],
+                    "last_seen": last_seen,
+                }
+            else:
+                self._pending_seen[address] = last_seen
+            if self._cache is not None and address in self._cache:
+                self._cache = {
+                    **self._cache,
+                    address: {**self._cache[address], "last_seen": last_seen},
+                }
+            self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        """Restart the debounced flush timer; call with the pending lock held"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+        self._flush_timer = threading.Timer(FLUSH_DELAY, self.flush)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def flush(self) -> bool:
+        """Write all staged devices in a single update"""
+        with self._pending_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending and not self._pending_seen:
+                return True
+
+            pending = self._pending
+            pending_seen = self._pending_seen
+            self._pending = {}
+            self._pending_seen = {}
+
+        def update_devices(devices: Dict[str, Dict]) -> List[Dict]:
+            devices.update(pending)
+            entries = [
+                {"op": "put", "addr": address, "data": data}
+                for address, data in pending.items()
+            ]
+            for address, last_seen in pending_seen.items():
+                if address in devices:
+                    devices[address] = {**devices[address], "last_seen": last_seen}
+                    entries.append(
+                        {
+                            "op": "upd",
+                            "addr": address,
+                            "fields": {"last_seen": last_seen},
+                        }
+                    )
+            return entries
+
+        # Written outside the pending lock so it's never held with the file lock
+        if self._atomic_write(update_devices):
             return True
 
-        return self._atomic_write(update_devices)
+        # Keep failed entries staged unless newer data replaced them
+        with self._pending_lock:
+            for address, data in pending.items():
+                self._pending.setdefault(address, data)
+            for address, last_seen in pending_seen.items():
+                if address not in self._pending:
+                    self._pending_seen.setdefault(address, last_seen)
+        return False
+
+    def _is_unchanged(self, device_data: Dict) -> bool:
+        """
+        Check whether the stored entry already matches device_data.
+
+        last_seen is ignored for the comparison; the caller stages it as a
+        separate update when nothing else changed.
+        """
+        try:
+            stored = self.load_devices().get(device_data["address"])
+        except Exception:
+            return False
+        if stored is None:
+            return False
+
+        return {k: v for k, v in stored.items() if k != "last_seen"} == {
+            k: v for k, v in device_data.items() if k != "last_seen"
+        }
+
+    def _merge_pending(self, devices: Dict[str, Dict]) -> None:
+        """Overlay staged entries onto devices; call with the pending lock held"""
+        devices.update(self._pending)
+        for address, last_seen in self._pending_seen.items():
+            if address in devices:
+                devices[address] = {**devices[address], "last_seen": last_seen}
+
+    def _invalidate_cache(self) -> None:
+        """Drop the in-memory devices cache"""
+        self._cache = None
+        self._cache_key = None
 
     def load_devices(self) -> Dict[str, Dict]:
         """Load all saved devices"""
         try:
+            key = self._state_key()
+            if self._cache is not None and key == self._cache_key:
+                return self._cache
+
+            devices = {}
             if self.devices_file.exists():
-                with open(self.devices_file, "r") as f:
-                    return json.load(f)
-            return {}
+                devices = _loads(self.devices_file.read_bytes())
+            self._replay_journal(devices)
+            # Staged devices are visible before they are flushed
+            with self._pending_lock:
+                self._merge_pending(devices)
+            self._cache = devices
+            self._cache_key = key
+            return devices
         except Exception as e:
             Logger.error(f"Failed to load devices: {str(e)}")
             raise
@@ -209,14 +477,15 @@ class DeviceManager:
 
     def delete_device(self, address: str) -> bool:
         """Delete a device from storage"""
+        self.flush()
 
-        def update_devices(devices: Dict[str, Dict]) -> bool:
+        def update_devices(devices: Dict[str, Dict]) -> Optional[Dict]:
             if address not in devices:
                 Logger.warning(f"Device {address} not found")
-                return False
+                return None
             del devices[address]
             Logger.debug(f"Device {address} deleted successfully")
-            return True
+            return {"op": "del", "addr": address}
 
         return self._atomic_write(update_devices)
 
@@ -228,22 +497,24 @@ class DeviceManager:
         description: str = None,
     ) -> bool:
         """Update device metadata"""
+        self.flush()
 
-        def update_devices(devices: Dict[str, Dict]) -> bool:
+        def update_devices(devices: Dict[str, Dict]) -> Optional[Dict]:
             if address not in devices:
                 Logger.error(f"Device {address} not found")
-                return False
+                return None
 
-            device_data = devices[address]
+            fields = {}
             if group is not None:
-                device_data["group"] = group
+                fields["group"] = group
             if tags is not None:
-                device_data["tags"] = tags
+                fields["tags"] = tags
             if description is not None:
-                device_data["description"] = description
+                fields["description"] = description
+            devices[address] = {**devices[address], **fields}
 
             Logger.debug(f"Device {address} metadata updated successfully")
-            return True
+            return {"op": "upd", "addr": address, "fields": fields}
 
         return self._atomic_write(update_devices)
 
@@ -290,9 +561,18 @@ class DeviceManager:
 
     def clear_all(self) -> bool:
         """Clear all stored devices"""
+        with self._pending_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            self._pending = {}
+            self._pending_seen = {}
         try:
             if self.devices_file.exists():
                 self.devices_file.unlink()
+            if self.journal_file.exists():
+                self.journal_file.unlink()
+            self._invalidate_cache()
             return True
         except Exception as e:
             Logger.error(f"Failed to clear devices: {str(e)}")
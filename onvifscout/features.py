@@ -3,18 +3,15 @@ import xml.etree.ElementTree as ET
 from typing import Dict, List, Optional, Set, Tuple
 
 import requests
-import urllib3
 from requests.auth import HTTPDigestAuth
 
 from .models import ONVIFCapabilities, ONVIFDevice
-from .utils import Logger
-
-# Disable SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+from .utils import Logger, disable_insecure_warnings
 
 
 class ONVIFFeatureDetector:
     def __init__(self, timeout: int = 5):
+        disable_insecure_warnings()
         self.timeout = timeout
         self._namespaces = {
             "s": "http://www.w3.org/2003/05/soap-envelope",
@@ -33,18 +30,18 @@ class ONVIFFeatureDetector:
             "xsd": "http://www.w3.org/2001/XMLSchema",
         }
 
-    def _create_get_device_info_message(self) -> str:
+    def _create_get_device_info_message(self) -> bytes:
         """Create SOAP message for GetDeviceInformation request"""
-        return """<?xml version="1.0" encoding="UTF-8"?>
+        return b"""<?xml version="1.0" encoding="UTF-8"?>
 <s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope">
     <s:Body xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema">
         <GetDeviceInformation xmlns="http://www.onvif.org/ver10/device/wsdl"/>
     </s:Body>
 </s:Envelope>"""
 
-    def _create_get_services_message(self) -> str:
+    def _create_get_services_message(self) -> bytes:
         """Create SOAP message for GetServices request"""
-        return """<?xml version="1.0" encoding="UTF-8"?>
+        return b"""<?xml version="1.0" encoding="UTF-8"?>
 <s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope">
     <s:Body>
         <tds:GetServices xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
@@ -53,9 +50,9 @@ class ONVIFFeatureDetector:
     </s:Body>
 </s:Envelope>"""
 
-    def _create_get_capabilities_message(self) -> str:
+    def _create_get_capabilities_message(self) -> bytes:
         """Create SOAP message for GetCapabilities request"""
-        return """<?xml version="1.0" encoding="UTF-8"?>
+        return b"""<?xml version="1.0" encoding="UTF-8"?>
 <s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope">
     <s:Body>
         <tds:GetCapabilities xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
@@ -72,7 +69,7 @@ class ONVIFFeatureDetector:
         Logger.debug(f"Content: {response.text[:1000]}...")  # First 1000 chars
 
         try:
-            root = ET.fromstring(response.text)
+            root = ET.fromstring(response.content)
             Logger.debug("XML Structure:")
             self._log_xml_structure(root)
         except ET.ParseError as e:
@@ -176,7 +173,7 @@ class ONVIFFeatureDetector:
             if response.status_code != 200:
                 return set()
 
-            root = ET.fromstring(response.text)
+            root = ET.fromstring(response.content)
             services = set()
 
             # Try multiple approaches to find services
@@ -277,7 +274,9 @@ class ONVIFFeatureDetector:
             )
 
             Logger.debug(f"\nSending GetCapabilities request to {url}")
-            Logger.debug(f"Request Body:\n{self._create_get_capabilities_message()}")
+            Logger.debug(
+                f"Request Body:\n{self._create_get_capabilities_message().decode()}"
+            )
 
             response = requests.post(
                 url,
@@ -296,7 +295,7 @@ class ONVIFFeatureDetector:
             if response.status_code != 200:
                 return {}
 
-            root = ET.fromstring(response.text)
+            root = ET.fromstring(response.content)
             capabilities = {}
 
             # Map of capability categories with multiple possible tag names
@@ -363,7 +362,7 @@ class ONVIFFeatureDetector:
             if response.status_code != 200:
                 return None
 
-            root = ET.fromstring(response.text)
+            root = ET.fromstring(response.content)
 
             # Try multiple approaches to find device info
             manufacturer = None
@@ -439,7 +439,8 @@ def main() -> None:
         if args.snapshot:
             snapshot_tool = process_snapshot_setup(args)
             if snapshot_tool:
-                handle_snapshot_capture(snapshot_tool, devices, args.snapshot_dir)
+                with snapshot_tool:
+                    handle_snapshot_capture(snapshot_tool, devices, args.snapshot_dir)
             else:
                 Logger.error(
                     "Snapshot tool initialization failed. Skipping snapshot capture."
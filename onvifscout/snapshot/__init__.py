@@ -1,3 +1,4 @@
+from .async_snapshot import AsyncONVIFSnapshot
 from .base import ONVIFSnapshotBase
 from .capability import CapabilityDetector
 from .image import ImageProcessor
@@ -5,9 +6,11 @@ from .interface import AsyncSnapshotInterface, SnapshotInterface
 from .main import ONVIFSnapshot
 from .profile import MediaProfileHandler
 from .rtsp import RTSPHandler
+from .stats import PathStats
 
 __all__ = [
     "ONVIFSnapshot",
+    "AsyncONVIFSnapshot",
     "SnapshotInterface",
     "AsyncSnapshotInterface",
     "ONVIFSnapshotBase",
@@ -15,6 +18,7 @@ __all__ = [
     "RTSPHandler",
     "MediaProfileHandler",
     "CapabilityDetector",
+    "PathStats",
 ]
 
 # Version of the snapshot module
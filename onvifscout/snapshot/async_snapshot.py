@@ -0,0 +1,194 @@
+import asyncio
+import concurrent.futures
+from typing import Dict, List, Optional, Tuple
+
+from ..models import ONVIFDevice
+from ..utils import Logger
+from .image import _is_image_data
+from .interface import AsyncSnapshotInterface
+from .main import ONVIFSnapshot, _cache_endpoint
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+
+class AsyncONVIFSnapshot(ONVIFSnapshot, AsyncSnapshotInterface):
+    """Snapshot capture that probes candidate URLs concurrently with aiohttp"""
+
+    def __init__(self, *args, **kwargs):
+        if aiohttp is None:
+            raise ImportError(
+                "aiohttp is required for async snapshots "
+                "(pip install onvifscout[async])"
+            )
+        super().__init__(*args, **kwargs)
+
+    def _create_client_session(self) -> "aiohttp.ClientSession":
+        """Create a pooled aiohttp session for snapshot probes"""
+        # Per-host limit follows --max-workers like the threaded URL probes
+        connector = aiohttp.TCPConnector(
+            ssl=False, limit=128, limit_per_host=self.max_workers
+        )
+        # Per-socket timeouts only: probes queued behind the per-host limit must
+        # not use up their time waiting for a free connection
+        request_timeout = min(3, self.timeout)
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                total=None, sock_connect=request_timeout, sock_read=request_timeout
+            ),
+        )
+
+    async def _try_snapshot_url_async(
+        self,
+        session: "aiohttp.ClientSession",
+        url: str,
+        auth: Tuple[str, str, str],
+        headers: Dict[str, str],
+        probe_only: bool = False,
+    ) -> Optional[bytes]:
+        """Fetch a snapshot URL and return the image data if it is valid
+
+        With probe_only the body is left unread past the image signature and
+        only that prefix is returned.
+        """
+        request_kwargs = {"headers": headers, "allow_redirects": True}
+        if auth[2] == "Digest":
+            if not hasattr(aiohttp, "DigestAuthMiddleware"):
+                # Older aiohttp has no Digest support, probe with requests instead
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    None, self._try_snapshot_url, url, auth, headers, probe_only
+                )
+            request_kwargs["middlewares"] = (
+                aiohttp.DigestAuthMiddleware(auth[0], auth[1]),
+            )
+        else:
+            request_kwargs["auth"] = aiohttp.BasicAuth(auth[0], auth[1])
+
+        try:
+            async with session.get(url, **request_kwargs) as response:
+                if response.status == 200:
+                    content_type = response.headers.get("content-type", "").lower()
+                    if "image/" in content_type:
+                        # Check the signature before pulling the rest of the body
+                        try:
+                            prefix = await response.content.readexactly(16)
+                        except asyncio.IncompleteReadError as e:
+                            prefix = e.partial
+                        if _is_image_data(prefix):
+                            Logger.success(f"Found working snapshot URL: {url}")
+                            if probe_only:
+                                return prefix
+                            return prefix + await response.content.read()
+                        Logger.debug(f"Invalid image data from {url}")
+                    else:
+                        Logger.debug(
+                            f"Non-image content type ({content_type}) from {url}"
+                        )
+                elif response.status == 401:
+                    Logger.debug(f"Authentication failed for {url}")
+                else:
+                    Logger.debug(f"HTTP {response.status} received from {url}")
+
+        except asyncio.TimeoutError:
+            Logger.debug(f"Timeout accessing {url}")
+        except aiohttp.ClientError as e:
+            Logger.debug(f"Error accessing {url}: {str(e)}")
+
+        return None
+
+    async def _try_vendor_urls_async(
+        self, session: "aiohttp.ClientSession", device: ONVIFDevice, context, cred
+    ) -> Optional[str]:
+        """Probe vendor-specific snapshot URLs concurrently, first success wins"""
+        headers = self._snapshot_headers()
+        loop = asyncio.get_running_loop()
+        url_paths = await loop.run_in_executor(
+            None, self._build_vendor_urls, device, context
+        )
+
+        task_to_url = {
+            asyncio.ensure_future(
+                self._try_snapshot_url_async(
+                    session, url, cred, headers, probe_only=True
+                )
+            ): url
+            for url in url_paths
+        }
+        pending = set(task_to_url)
+        deadline = loop.time() + 10
+
+        try:
+            while pending:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    Logger.warning("Parallel URL testing timed out")
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.cancelled() or task.exception():
+                        continue
+                    result = task.result()
+                    if result:
+                        url = task_to_url[task]
+                        self.path_stats.record(context.name, url_paths[url])
+                        _cache_endpoint(device.address, "snapshot", url)
+                        return url
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        return None
+
+    async def _capture_with_session(
+        self, session: "aiohttp.ClientSession", device: ONVIFDevice, output_dir: str
+    ) -> Optional[str]:
+        """Capture a snapshot from one device using a shared aiohttp session"""
+        loop = asyncio.get_running_loop()
+
+        def find_vendor_url(device: ONVIFDevice, context, cred) -> Optional[str]:
+            # Called on the capture thread, the race itself runs on the loop
+            return asyncio.run_coroutine_threadsafe(
+                self._try_vendor_urls_async(session, device, context, cred), loop
+            ).result()
+
+        # The blocking steps get a thread of their own so they never hold a
+        # default executor worker the vendor race may be waiting for
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        try:
+            return await loop.run_in_executor(
+                executor, self._capture_with, device, output_dir, find_vendor_url
+            )
+        finally:
+            executor.shutdown(wait=False)
+
+    async def capture_snapshot_async(
+        self, device: ONVIFDevice, output_dir: str = "snapshots"
+    ) -> Optional[str]:
+        """Asynchronously capture a snapshot"""
+        async with self._create_client_session() as session:
+            return await self._capture_with_session(session, device, output_dir)
+
+    async def capture_multiple_async(
+        self, devices: list, output_dir: str = "snapshots"
+    ) -> List[Optional[str]]:
+        """Capture snapshots from multiple devices concurrently"""
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def capture(
+            session: "aiohttp.ClientSession", device: ONVIFDevice
+        ) -> Optional[str]:
+            async with semaphore:
+                return await self._capture_with_session(session, device, output_dir)
+
+        async with self._create_client_session() as session:
+            return await asyncio.gather(
+                *(capture(session, device) for device in devices)
+            )
@@ -1,79 +1,240 @@
-import xml.etree.ElementTree as ET
-from datetime import time
-from typing import Dict, Optional, Tuple
+import base64
+import random
+import shutil
+import time
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Union
+from xml.sax.saxutils import escape
 
 import requests
-import urllib3
-from requests.auth import HTTPDigestAuth
+from lxml import etree
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase, HTTPDigestAuth
 
-from ..utils import Logger
+from ..utils import Logger, disable_insecure_warnings
+from .image import _is_image_data
+from .profile import MediaProfileHandler
 
-# Disable SSL warnings
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# Shared SOAP response parser; entities are never resolved and xml:id
+# attributes are not indexed since nothing looks elements up by ID
+_SOAP_PARSER = etree.XMLParser(
+    remove_blank_text=True, huge_tree=False, resolve_entities=False, collect_ids=False
+)
 
+# Statuses meaning a snapshot URL is definitely unusable, not worth a retry
+_MISS_STATUSES = (401, 403, 404)
+# HEAD statuses meaning the method is unsupported, so the probe needs a GET
+_HEAD_UNSUPPORTED_STATUSES = (405, 501)
 
-class ONVIFSnapshotBase:
-    def __init__(self, timeout: int = 5, max_retries: int = 3):
-        self.timeout = timeout
-        self.max_retries = max_retries
-        self._namespaces = {
-            "s": "http://www.w3.org/2003/05/soap-envelope",
-            "trt": "http://www.onvif.org/ver10/media/wsdl",
-            "tt": "http://www.onvif.org/ver10/schema",
-            "tr2": "http://www.onvif.org/ver20/media/wsdl",
-        }
-        self.session = requests.Session()
-        self.session.verify = False
+# Per-request headers for SOAP calls, shared rather than rebuilt per call
+_SOAP_HEADERS = {"Content-Type": "application/soap+xml"}
 
-    def _create_get_profiles_message(self) -> str:
-        """Create SOAP message for GetProfiles request"""
-        return """<?xml version="1.0" encoding="UTF-8"?>
+# Constant request body, encoded once
+_GET_PROFILES_MSG = b"""<?xml version="1.0" encoding="UTF-8"?>
 <s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope">
     <s:Body>
         <GetProfiles xmlns="http://www.onvif.org/ver10/media/wsdl"/>
     </s:Body>
 </s:Envelope>"""
 
-    def _create_get_snapshot_uri_message(self, profile_token: str) -> str:
-        """Create SOAP message for GetSnapshotUri request"""
-        return f"""<?xml version="1.0" encoding="UTF-8"?>
+# Parameterised body split around the escaped profile token
+_GET_SNAPSHOT_URI_PREFIX = b"""<?xml version="1.0" encoding="UTF-8"?>
 <s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope">
     <s:Body>
         <GetSnapshotUri xmlns="http://www.onvif.org/ver10/media/wsdl">
-            <ProfileToken>{profile_token}</ProfileToken>
+            <ProfileToken>"""
+_GET_SNAPSHOT_URI_SUFFIX = b"""</ProfileToken>
         </GetSnapshotUri>
     </s:Body>
 </s:Envelope>"""
 
-    def _is_valid_image(self, data: bytes) -> bool:
+
+class _PrecomputedBasicAuth(AuthBase):
+    """Basic auth with the Authorization header encoded once, not per request"""
+
+    def __init__(self, username: str, password: str):
+        # latin-1, as requests uses for Basic credentials
+        credentials = f"{username}:{password}".encode("latin1")
+        self.header = "Basic " + base64.b64encode(credentials).decode("ascii")
+
+    def __call__(self, r: requests.PreparedRequest) -> requests.PreparedRequest:
+        r.headers["Authorization"] = self.header
+        return r
+
+
+class ONVIFSnapshotBase:
+    def __init__(self, timeout: int = 5, max_retries: int = 3):
+        disable_insecure_warnings()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.verify = False
+        self.session.headers.update(
+            {"Connection": "keep-alive", "User-Agent": "onvifscout/1.0"}
+        )
+        # Large pool so keep-alive connections survive scans of many devices
+        adapter = HTTPAdapter(pool_connections=64, pool_maxsize=128, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._auth_cache: Dict[Tuple[str, str, str], Any] = {}
+
+    def _auth_for(self, auth: Tuple[str, str, str]) -> Any:
+        """
+        Get the requests auth handler for a credential tuple.
+
+        Digest handlers are reused so the stored challenge lets later requests
+        send the Authorization header up front instead of taking a 401 first.
+        Basic handlers carry the header already encoded.
+        """
+        # Credentials loaded from JSON arrive as lists, which can't be dict keys
+        key = tuple(auth)
+        handler = self._auth_cache.get(key)
+        if handler is None:
+            if auth[2] == "Digest":
+                handler = HTTPDigestAuth(auth[0], auth[1])
+            else:
+                handler = _PrecomputedBasicAuth(auth[0], auth[1])
+            self._auth_cache[key] = handler
+        return handler
+
+    def close(self) -> None:
+        """Close the HTTP session and release pooled connections"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _create_get_profiles_message(self) -> bytes:
+        """Create SOAP message for GetProfiles request"""
+        return _GET_PROFILES_MSG
+
+    def _create_get_snapshot_uri_message(self, profile_token: str) -> bytes:
+        """Create SOAP message for GetSnapshotUri request"""
+        return (
+            _GET_SNAPSHOT_URI_PREFIX
+            + escape(profile_token).encode("utf-8")
+            + _GET_SNAPSHOT_URI_SUFFIX
+        )
+
+    def _is_valid_image(self, data: Union[bytes, memoryview]) -> bool:
         """Validate image data format"""
-        if data.startswith(b"\xff\xd8\xff"):  # JPEG header
-            return True
-        if data.startswith(b"\x89PNG\r\n\x1a\n"):  # PNG header
+        return _is_image_data(data)
+
+    def _probe_snapshot_headers(
+        self, url: str, auth_handler, headers: Dict[str, str]
+    ) -> Optional[bool]:
+        """
+        Check snapshot URL headers with a HEAD request before fetching the body.
+
+        Returns False if the URL clearly does not serve an image, True if it
+        looks like one and None if HEAD is unsupported, failed to connect or
+        gave no body length (common for dynamic CGI snapshot endpoints).
+        """
+        try:
+            response = self.session.head(
+                url,
+                auth=auth_handler,
+                timeout=min(3, self.timeout),
+                headers=headers,
+                allow_redirects=True,
+            )
+        except requests.exceptions.RequestException as e:
+            Logger.debug(f"HEAD request failed for {url}: {str(e)}")
+            return None
+
+        if response.status_code in _HEAD_UNSUPPORTED_STATUSES:
+            return None
+        if response.status_code != 200:
+            # Missing, forbidden or unauthorized paths won't serve a GET either
+            Logger.debug(f"HTTP {response.status_code} received from {url}")
+            return False
+
+        content_type = response.headers.get("content-type", "").lower()
+        if content_type and "image/" not in content_type:
+            Logger.debug(f"Non-image content type ({content_type}) from {url}")
+            return False
+
+        content_length = response.headers.get("content-length", "")
+        if not content_length.isdigit() or int(content_length) == 0:
+            return None
+        if int(content_length) < 1000:
+            Logger.debug(f"Snapshot too small ({content_length} bytes) from {url}")
+            return False
+
+        return True
+
+    def _probe_snapshot_range(
+        self, url: str, auth_handler, headers: Dict[str, str]
+    ) -> Optional[bool]:
+        """
+        Check the first bytes of a snapshot URL with a small Range request.
+
+        Used when HEAD is unsupported. Returns False if the body is clearly not
+        an image, True if the magic bytes match and None if inconclusive.
+        """
+        response = None
+        try:
+            response = self.session.get(
+                url,
+                auth=auth_handler,
+                timeout=min(3, self.timeout),
+                headers={**headers, "Range": "bytes=0-15"},
+                stream=True,
+                allow_redirects=True,
+            )
+            if response.status_code in _MISS_STATUSES:
+                Logger.debug(f"HTTP {response.status_code} received from {url}")
+                return False
+            if response.status_code not in (200, 206):
+                return None
+
+            content_type = response.headers.get("content-type", "").lower()
+            if content_type and "image/" not in content_type:
+                Logger.debug(f"Non-image content type ({content_type}) from {url}")
+                return False
+
+            if not self._is_valid_image(response.raw.read(16, decode_content=True)):
+                Logger.debug(f"Invalid image data from {url}")
+                return False
             return True
-        return False
+
+        except requests.exceptions.RequestException as e:
+            Logger.debug(f"Range request failed for {url}: {str(e)}")
+            return None
+        finally:
+            if response is not None:
+                response.close()
 
     def _try_snapshot_url(
-        self, url: str, auth: Tuple[str, str, str], headers: Dict[str, str]
+        self,
+        url: str,
+        auth: Tuple[str, str, str],
+        headers: Dict[str, str],
+        probe_only: bool = False,
     ) -> Optional[bytes]:
-        """Enhanced snapshot URL testing with better error handling"""
-        auth_handler = (
-            HTTPDigestAuth(auth[0], auth[1])
-            if auth[2] == "Digest"
-            else (auth[0], auth[1])
-        )
+        """
+        Enhanced snapshot URL testing with better error handling.
+
+        With probe_only the body is not downloaded; the 16 byte signature
+        prefix is returned as proof the URL serves an image.
+        """
+        auth_handler = self._auth_for(auth)
+
+        # Cheap header check so non-image URLs don't transfer a body
+        probe = self._probe_snapshot_headers(url, auth_handler, headers)
+        if probe is None:
+            # No usable HEAD answer, check the magic bytes with a tiny GET
+            probe = self._probe_snapshot_range(url, auth_handler, headers)
+        if probe is False:
+            return None
 
         response = None
         for attempt in range(self.max_retries):
             try:
-                # Add random parameter to bypass cache
-                cache_buster = f"nocache={int(time.time())}"
-                url_with_cache_buster = (
-                    f"{url}{'&' if '?' in url else '?'}{cache_buster}"
-                )
-
                 response = self.session.get(
-                    url_with_cache_buster,
+                    url,
                     auth=auth_handler,
                     timeout=min(3, self.timeout),
                     headers=headers,
@@ -84,10 +245,15 @@ class ONVIFSnapshotBase:
                 if response.status_code == 200:
                     content_type = response.headers.get("content-type", "").lower()
                     if "image/" in content_type:
-                        content = response.content
-                        if self._is_valid_image(content):
+                        # Check the magic bytes before pulling the whole body
+                        magic = next(response.iter_content(chunk_size=16), b"")
+                        if self._is_valid_image(magic):
                             Logger.success(f"Found working snapshot URL: {url}")
-                            return content
+                            if probe_only:
+                                return magic
+                            return magic + b"".join(
+                                response.iter_content(chunk_size=64 * 1024)
+                            )
                         else:
                             Logger.debug(f"Invalid image data from {url}")
                     else:
@@ -97,11 +263,15 @@ class ONVIFSnapshotBase:
                 elif response.status_code == 401:
                     Logger.debug(f"Authentication failed for {url}")
                     break
+                elif response.status_code in _MISS_STATUSES:
+                    Logger.debug(f"HTTP {response.status_code} received from {url}")
+                    break
                 else:
                     Logger.debug(f"HTTP {response.status_code} received from {url}")
 
                 if attempt < self.max_retries - 1:
-                    time.sleep(0.5 * (attempt + 1))  # Exponential backoff
+                    # Exponential backoff with jitter
+                    time.sleep(0.5 * (2**attempt) * (1 + random.random() * 0.5))
 
             except requests.exceptions.Timeout:
                 Logger.debug(f"Timeout accessing {url}")
@@ -113,29 +283,172 @@ class ONVIFSnapshotBase:
 
         return None
 
+    def _download_snapshot(
+        self,
+        url: str,
+        auth: Tuple[str, str, str],
+        headers: Dict[str, str],
+        output_path: str,
+    ) -> bool:
+        """Stream a snapshot straight to disk instead of buffering it in memory"""
+        auth_handler = self._auth_for(auth)
+
+        try:
+            with self.session.get(
+                url,
+                auth=auth_handler,
+                timeout=self.timeout,
+                headers=headers,
+                stream=True,
+                allow_redirects=True,
+            ) as response:
+                if response.status_code != 200:
+                    Logger.debug(f"HTTP {response.status_code} received from {url}")
+                    return False
+
+                # Check headers before reading any of the body
+                content_type = response.headers.get("content-type", "").lower()
+                if "image/" not in content_type:
+                    Logger.debug(f"Non-image content type ({content_type}) from {url}")
+                    return False
+
+                response.raw.decode_content = True
+                with open(output_path, "wb") as f:
+                    shutil.copyfileobj(response.raw, f, length=64 * 1024)
+                return True
+
+        except (requests.exceptions.RequestException, OSError) as e:
+            Logger.debug(f"Error downloading snapshot from {url}: {str(e)}")
+            return False
+
     def _create_soap_request(
-        self, url: str, soap_message: str, auth: Tuple[str, str, str]
-    ) -> Optional[ET.Element]:
+        self, url: str, soap_message: Union[str, bytes], auth: Tuple[str, str, str]
+    ) -> Optional[etree._Element]:
         """Send SOAP request and return parsed XML response"""
         try:
-            auth_handler = (
-                HTTPDigestAuth(auth[0], auth[1])
-                if auth[2] == "Digest"
-                else (auth[0], auth[1])
-            )
+            auth_handler = self._auth_for(auth)
 
             response = self.session.post(
                 url,
                 auth=auth_handler,
                 data=soap_message,
-                headers={"Content-Type": "application/soap+xml"},
+                headers=_SOAP_HEADERS,
                 timeout=self.timeout,
             )
 
             if response.status_code == 200:
-                return ET.fromstring(response.text)
+                # Parse the raw bytes so lxml handles the declared encoding
+                return etree.fromstring(response.content, _SOAP_PARSER)
 
         except Exception as e:
             Logger.debug(f"SOAP request failed: {str(e)}")
 
         return None
+
+    def _create_soap_request_iter(
+        self,
+        url: str,
+        soap_message: Union[str, bytes],
+        auth: Tuple[str, str, str],
+        target_local_names: FrozenSet[str],
+        stop_early: bool = True,
+    ) -> Optional[etree._Element]:
+        """
+        Send SOAP request and stream-parse only the elements that are needed.
+
+        Matching elements (by local name, outermost only) are collected under a
+        new root so the detectors can query the result like a full response.
+        Everything else is freed as it is parsed. With stop_early the rest of
+        the response is skipped once every target name has been seen.
+        """
+        response = None
+        try:
+            response = self.session.post(
+                url,
+                auth=self._auth_for(auth),
+                data=soap_message,
+                headers=_SOAP_HEADERS,
+                timeout=self.timeout,
+                stream=True,
+            )
+            if response.status_code != 200:
+                return None
+
+            response.raw.decode_content = True
+            result = etree.Element("Response")
+            remaining = set(target_local_names)
+            depth = 0
+
+            for event, elem in etree.iterparse(
+                response.raw,
+                events=("start", "end"),
+                huge_tree=False,
+                recover=True,
+                resolve_entities=False,
+                remove_blank_text=True,
+                collect_ids=False,
+            ):
+                local_name = elem.tag.rpartition("}")[2]
+                if local_name in target_local_names:
+                    if event == "start":
+                        depth += 1
+                        continue
+                    depth -= 1
+                    if depth == 0:
+                        # Moving the finished element out frees it from the tree
+                        result.append(elem)
+                        remaining.discard(local_name)
+                        if stop_early and not remaining:
+                            break
+                    continue
+
+                if event == "end" and depth == 0:
+                    # Drop parsed elements outside any match as we go
+                    elem.clear()
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+
+            return result
+
+        except Exception as e:
+            Logger.debug(f"SOAP request failed: {str(e)}")
+            return None
+        finally:
+            if response is not None:
+                response.close()
+
+    def _query_snapshot_uris(
+        self, media_url: str, auth: Tuple[str, str, str]
+    ) -> List[str]:
+        """
+        Ask a media service for the snapshot URI of each of its profiles.
+
+        ONVIF has no way to batch operations in one envelope and GetSnapshotUri
+        needs a token from GetProfiles, so the calls go back to back over the
+        shared keep-alive session and are stream-parsed for the parts needed.
+        """
+        profile_handler = MediaProfileHandler()
+        response = self._create_soap_request_iter(
+            media_url,
+            self._create_get_profiles_message(),
+            auth,
+            MediaProfileHandler.PROFILE_ELEMENTS,
+            stop_early=False,
+        )
+        if response is None:
+            return []
+
+        uris = []
+        for profile in profile_handler.get_media_profiles(response):
+            response = self._create_soap_request_iter(
+                media_url,
+                self._create_get_snapshot_uri_message(profile["token"]),
+                auth,
+                MediaProfileHandler.URI_ELEMENTS,
+            )
+            if response is None:
+                continue
+            uri = profile_handler.extract_uri_from_response(response)
+            if uri and uri not in uris:
+                uris.append(uri)
+        return uris
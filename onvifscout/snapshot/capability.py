@@ -1,17 +1,12 @@
-import xml.etree.ElementTree as ET
-from typing import Dict, Set
+import functools
+from typing import Dict, List, Optional, Set
 from urllib.parse import urlparse
 
-from ..utils import Logger
-
+from lxml import etree
 
-class CapabilityDetector:
-    def __init__(self, namespaces: Dict[str, str]):
-        self._namespaces = namespaces
+from ..utils import Logger
 
-    def _create_get_capabilities_message(self) -> str:
-        """Create SOAP message for GetCapabilities request"""
-        return """<?xml version="1.0" encoding="UTF-8"?>
+_GET_CAPABILITIES_MSG = b"""<?xml version="1.0" encoding="UTF-8"?>
 <s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope">
     <s:Body>
         <tds:GetCapabilities xmlns:tds="http://www.onvif.org/ver10/device/wsdl">
@@ -21,40 +16,101 @@ class CapabilityDetector:
     </s:Body>
 </s:Envelope>"""
 
+
+# Common endpoints added alongside whatever the device advertises
+_COMMON_SNAPSHOT_PATHS = (
+    "/onvif/snapshot",
+    "/onvif/media/snapshot",
+    "/onvif-http/snapshot",
+    "/media/snapshot",
+    "/snapshot",
+)
+_COMMON_RTSP_PATHS = (
+    "/onvif/media/video1",
+    "/onvif/video",
+    "/live/main",
+    "/live/ch1",
+    "/stream1",
+    "/h264",
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _base_url_for(device_url: str) -> str:
+    """HTTP base URL (scheme, host and port) of a device service URL"""
+    parsed = urlparse(device_url)
+    # Without an explicit port the URL would otherwise end in ":None"
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return f"{parsed.scheme}://{parsed.hostname}:{port}"
+
+
+@functools.lru_cache(maxsize=256)
+def _rtsp_base_for(device_url: str) -> str:
+    """Default RTSP base URL for the host of a device service URL"""
+    return f"rtsp://{urlparse(device_url).hostname}:554"
+
+
+class CapabilityDetector:
+    # Elements holding everything the capability queries look at, for use
+    # with ONVIFSnapshotBase._create_soap_request_iter
+    RESPONSE_ELEMENTS = frozenset({"Media", "Imaging"})
+
+    @staticmethod
+    def _find_local(
+        element: etree._Element, local_name: str
+    ) -> Optional[etree._Element]:
+        """
+        Find the first descendant with a local name, in any namespace.
+
+        A single walk that stops at the first match, instead of a namespaced
+        query followed by a local-name() fallback over the whole tree.
+        """
+        return next(element.iterdescendants(f"{{*}}{local_name}"), None)
+
+    @staticmethod
+    def _uri_texts(element: etree._Element, *parent_names: str) -> List[str]:
+        """
+        Collect Uri text under the named elements, in any namespace.
+
+        Tag-filtered iteration skips straight past documents that never use
+        the names, where a local-name() XPath would still test every node.
+        """
+        return [
+            uri.text
+            for name in parent_names
+            for parent in element.iterdescendants(f"{{*}}{name}")
+            for uri in parent.iterdescendants("{*}Uri")
+            if uri.text
+        ]
+
+    def _create_get_capabilities_message(self) -> bytes:
+        """Create SOAP message for GetCapabilities request"""
+        return _GET_CAPABILITIES_MSG
+
     def _extract_snapshot_capabilities(
-        self, soap_response: ET.Element
+        self, soap_response: etree._Element
     ) -> Dict[str, bool]:
         """Extract snapshot-related capabilities from SOAP response"""
         capabilities = {}
         try:
             # Look for media capabilities
-            media = soap_response.find(
-                ".//trt:Media", self._namespaces
-            ) or soap_response.find(".//*[local-name()='Media']")
+            media = self._find_local(soap_response, "Media")
 
             if media is not None:
                 # Check for snapshot support
-                snapshot = media.find(
-                    ".//tt:SnapshotUri", self._namespaces
-                ) or media.find(".//*[local-name()='SnapshotUri']")
+                snapshot = self._find_local(media, "SnapshotUri")
                 capabilities["SupportsSnapshot"] = snapshot is not None
 
                 # Check for JPEG support
-                jpeg = media.find(".//tt:JPEG", self._namespaces) or media.find(
-                    ".//*[local-name()='JPEG']"
-                )
+                jpeg = self._find_local(media, "JPEG")
                 capabilities["SupportsJPEG"] = jpeg is not None
 
                 # Check for H264 support (for RTSP)
-                h264 = media.find(".//tt:H264", self._namespaces) or media.find(
-                    ".//*[local-name()='H264']"
-                )
+                h264 = self._find_local(media, "H264")
                 capabilities["SupportsH264"] = h264 is not None
 
             # Look for imaging capabilities
-            imaging = soap_response.find(
-                ".//timg:Imaging", self._namespaces
-            ) or soap_response.find(".//*[local-name()='Imaging']")
+            imaging = self._find_local(soap_response, "Imaging")
             if imaging is not None:
                 capabilities["SupportsImaging"] = True
 
@@ -63,37 +119,33 @@ class CapabilityDetector:
 
         return capabilities
 
+    def get_media_service_url(self, soap_response: etree._Element) -> Optional[str]:
+        """Extract the media service address from capabilities"""
+        try:
+            media = self._find_local(soap_response, "Media")
+            if media is not None:
+                xaddr = self._find_local(media, "XAddr")
+                if xaddr is not None and xaddr.text:
+                    return xaddr.text.strip()
+        except Exception as e:
+            Logger.debug(f"Error getting media service URL: {str(e)}")
+        return None
+
     def get_snapshot_endpoints(
-        self, device_url: str, soap_response: ET.Element
+        self, device_url: str, soap_response: etree._Element
     ) -> Set[str]:
         """Extract potential snapshot endpoints from capabilities"""
         endpoints = set()
         try:
-            parsed = urlparse(device_url)
-            base_url = f"{parsed.scheme}://{parsed.hostname}:{parsed.port}"
-
-            # Look for snapshot URI in capabilities
-            snapshot_elements = soap_response.findall(
-                ".//*[local-name()='SnapshotUri']"
-            )
-            for elem in snapshot_elements:
-                uri = elem.find(".//*[local-name()='Uri']")
-                if uri is not None and uri.text:
-                    # Handle both absolute and relative URIs
-                    if uri.text.startswith("http"):
-                        endpoints.add(uri.text)
-                    else:
-                        endpoints.add(f"{base_url}{uri.text}")
+            base_url = _base_url_for(device_url)
 
             # Add common snapshot endpoints based on found capabilities
-            common_paths = [
-                "/onvif/snapshot",
-                "/onvif/media/snapshot",
-                "/onvif-http/snapshot",
-                "/media/snapshot",
-                "/snapshot",
-            ]
-            endpoints.update(f"{base_url}{path}" for path in common_paths)
+            endpoints = {base_url + path for path in _COMMON_SNAPSHOT_PATHS}
+
+            # Look for snapshot URI in capabilities
+            for uri in self._uri_texts(soap_response, "SnapshotUri"):
+                # Handle both absolute and relative URIs
+                endpoints.add(uri if uri.startswith("http") else f"{base_url}{uri}")
 
         except Exception as e:
             Logger.debug(f"Error getting snapshot endpoints: {str(e)}")
@@ -101,37 +153,19 @@ class CapabilityDetector:
         return endpoints
 
     def get_stream_endpoints(
-        self, device_url: str, soap_response: ET.Element
+        self, device_url: str, soap_response: etree._Element
     ) -> Set[str]:
         """Extract potential streaming endpoints from capabilities"""
         endpoints = set()
         try:
-            parsed = urlparse(device_url)
-            hostname = parsed.hostname
-
-            # Look for stream URI in capabilities
-            stream_elements = soap_response.findall(
-                ".//*[local-name()='StreamingUri']"
-            ) or soap_response.findall(".//*[local-name()='StreamUri']")
-
-            for elem in stream_elements:
-                uri = elem.find(".//*[local-name()='Uri']")
-                if uri is not None and uri.text:
-                    if uri.text.startswith("rtsp"):
-                        endpoints.add(uri.text)
-                    else:
-                        endpoints.add(f"rtsp://{hostname}:554{uri.text}")
+            rtsp_base = _rtsp_base_for(device_url)
 
             # Add common RTSP endpoints
-            common_paths = [
-                "/onvif/media/video1",
-                "/onvif/video",
-                "/live/main",
-                "/live/ch1",
-                "/stream1",
-                "/h264",
-            ]
-            endpoints.update(f"rtsp://{hostname}:554{path}" for path in common_paths)
+            endpoints = {rtsp_base + path for path in _COMMON_RTSP_PATHS}
+
+            # Look for stream URI in capabilities
+            for uri in self._uri_texts(soap_response, "StreamingUri", "StreamUri"):
+                endpoints.add(uri if uri.startswith("rtsp") else f"{rtsp_base}{uri}")
 
         except Exception as e:
             Logger.debug(f"Error getting stream endpoints: {str(e)}")
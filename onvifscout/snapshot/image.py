@@ -1,41 +1,65 @@
 import os
-from typing import Optional
+from typing import Optional, Union
 
 from PIL import Image
 
 from ..utils import Logger
 
+# Leading bytes of the image formats cameras serve: JPEG, PNG and GIF
+_IMAGE_MAGIC = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF87a", b"GIF89a")
+
+
+def _is_image_data(data: Union[bytes, memoryview]) -> bool:
+    """Check whether data starts with a known image signature"""
+    if isinstance(data, memoryview):
+        # Only the signature is needed, avoid copying the whole buffer
+        data = data[:12].tobytes()
+    if data.startswith(_IMAGE_MAGIC):
+        return True
+    # WebP is a RIFF container; WAV and AVI share the RIFF prefix
+    return data.startswith(b"RIFF") and data[8:12] == b"WEBP"
+
 
 class ImageProcessor:
     def __init__(self, image_format: str = "jpg", quality: int = 90):
         self.image_format = image_format.lower()
         self.quality = quality
 
-    def _is_valid_image(self, data: bytes) -> bool:
+    def _is_valid_image(self, data: Union[bytes, memoryview]) -> bool:
         """Validate image data format"""
-        return (
-            data.startswith(b"\xff\xd8\xff")  # JPEG header
-            or data.startswith(b"\x89PNG\r\n\x1a\n")
-        )  # PNG header
+        return _is_image_data(data)
 
     def save_image(self, image_data: bytes, output_path: str) -> Optional[str]:
         """Save image data with improved format detection and error handling"""
-        temp_path = None
+        # Validate image data
+        if not self._is_valid_image(image_data):
+            Logger.debug(f"Invalid image data received (size: {len(image_data)} bytes)")
+            return None
+
+        temp_path = output_path + ".temp"
         try:
             # Create a temporary file with original format
-            temp_path = output_path + ".temp"
             with open(temp_path, "wb") as f:
                 f.write(image_data)
+        except Exception as e:
+            Logger.error(f"Error processing image: {str(e)}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
 
-            # Validate image data
-            if not self._is_valid_image(image_data):
-                Logger.debug(
-                    f"Invalid image data received (size: {len(image_data)} bytes)"
-                )
+        return self.save_image_file(temp_path, output_path)
+
+    def save_image_file(self, source_path: str, output_path: str) -> Optional[str]:
+        """Convert an image file already on disk, removing the source afterwards"""
+        try:
+            with open(source_path, "rb") as f:
+                header = f.read(12)
+            if not self._is_valid_image(header):
+                Logger.debug(f"Invalid image data in {source_path}")
                 return None
 
             # Process with PIL
-            with Image.open(temp_path) as img:
+            with Image.open(source_path) as img:
                 Logger.debug(
                     f"Image opened successfully: {img.format} {img.size} {img.mode}"
                 )
@@ -78,9 +102,9 @@ class ImageProcessor:
             Logger.error(f"Error processing image: {str(e)}")
             return None
         finally:
-            if temp_path and os.path.exists(temp_path):
+            if os.path.exists(source_path):
                 try:
-                    os.remove(temp_path)
+                    os.remove(source_path)
                 except Exception:
                     pass
 
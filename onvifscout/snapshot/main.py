@@ -1,17 +1,49 @@
 import concurrent.futures
+import errno
 import os
+import select
 import shutil
+import socket
 import tempfile
+import threading
+import time
 from datetime import datetime
-from typing import List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 from ..device_contexts import DeviceContextManager
 from ..models import ONVIFDevice
 from ..utils import Logger
 from .base import ONVIFSnapshotBase
+from .capability import CapabilityDetector
 from .image import ImageProcessor
 from .interface import SnapshotInterface
 from .rtsp import RTSPHandler
+from .stats import PathStats
+
+# Last working endpoint per (device address, kind) as (timestamp, url)
+_ENDPOINT_CACHE: Dict[Tuple[str, str], Tuple[float, str]] = {}
+_ENDPOINT_CACHE_TTL = 300.0
+
+
+def _get_cached_endpoint(address: str, kind: str) -> Optional[str]:
+    """Return the cached working endpoint for a device, if still fresh"""
+    entry = _ENDPOINT_CACHE.get((address, kind))
+    if entry is None:
+        return None
+    if time.monotonic() - entry[0] > _ENDPOINT_CACHE_TTL:
+        _drop_cached_endpoint(address, kind)
+        return None
+    return entry[1]
+
+
+def _cache_endpoint(address: str, kind: str, url: str) -> None:
+    """Remember the working endpoint for a device"""
+    _ENDPOINT_CACHE[(address, kind)] = (time.monotonic(), url)
+
+
+def _drop_cached_endpoint(address: str, kind: str) -> None:
+    """Forget the cached endpoint for a device once it stops working"""
+    _ENDPOINT_CACHE.pop((address, kind), None)
 
 
 class ONVIFSnapshot(ONVIFSnapshotBase, SnapshotInterface):
@@ -31,48 +63,201 @@ class ONVIFSnapshot(ONVIFSnapshotBase, SnapshotInterface):
         self.quality = quality
         self.image_processor = ImageProcessor(image_format, quality)
         self.rtsp_handler = RTSPHandler(timeout, image_processor=self.image_processor)
+        self.path_stats = PathStats()
+        self.capability_detector = CapabilityDetector()
 
-    def _try_vendor_urls_parallel(
-        self, device: ONVIFDevice, context, cred
-    ) -> Optional[bytes]:
-        """Try vendor-specific snapshot URLs in parallel using device context"""
-        headers = {
-            "Accept": f"image/{self.image_processor.image_format}, image/*, */*",
+    def close(self) -> None:
+        """Persist path statistics and close the HTTP session"""
+        self.path_stats.flush()
+        super().close()
+
+    def _filter_open_ports(
+        self, host: str, ports: List[int], timeout: float = 0.3
+    ) -> List[int]:
+        """Return the ports accepting TCP connections, probed concurrently"""
+        pending = {}
+        open_ports = set()
+        try:
+            for port in dict.fromkeys(ports):
+                sock = None
+                try:
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    sock.setblocking(False)
+                    result = sock.connect_ex((host, port))
+                except OSError as e:
+                    Logger.debug(f"Port probe failed for {host}:{port}: {str(e)}")
+                    if sock:
+                        sock.close()
+                    continue
+                if result == 0:
+                    open_ports.add(port)
+                    sock.close()
+                elif result in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    pending[sock] = port
+                else:
+                    sock.close()
+
+            deadline = time.monotonic() + timeout
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                _, writable, _ = select.select([], list(pending), [], remaining)
+                if not writable:
+                    break
+                for sock in writable:
+                    port = pending.pop(sock)
+                    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                        open_ports.add(port)
+                    sock.close()
+        finally:
+            for sock in pending:
+                sock.close()
+
+        return [port for port in dict.fromkeys(ports) if port in open_ports]
+
+    def _snapshot_headers(self) -> Dict[str, str]:
+        """Request headers for snapshot URL probes"""
+        return {
+            # Only ask for images so well-behaved servers skip HTML error pages
+            "Accept": "image/jpeg, image/png, image/*;q=0.8",
             "User-Agent": "ONVIF Client/1.0",
         }
 
-        # Generate URLs from context
-        urls = []
-        for port in context.ports:
-            for path in context.paths:
-                url = f"http://{device.address}:{port}{path}"
-                if url not in urls:
-                    urls.append(url)
-
-        # Try URLs in parallel
-        with concurrent.futures.ThreadPoolExecutor(
-            max_workers=self.max_workers
-        ) as executor:
-            future_to_url = {
-                executor.submit(self._try_snapshot_url, url, cred, headers): url
-                for url in urls
-            }
+    def _build_vendor_urls(self, device: ONVIFDevice, context) -> Dict[str, str]:
+        """Map candidate snapshot URLs to their path, in probe order"""
+        # Only probe HTTP paths on ports that accept connections
+        ports = self._filter_open_ports(device.address, context.ports)
+        if not ports:
+            Logger.debug(
+                f"No open snapshot ports found on {device.address}, trying all"
+            )
+            ports = context.ports
 
-            try:
-                for future in concurrent.futures.as_completed(
-                    future_to_url, timeout=10
-                ):
-                    try:
-                        result = future.result()
-                        if result:
-                            return result
-                    except Exception:
-                        continue
-            except concurrent.futures.TimeoutError:
-                Logger.warning("Parallel URL testing timed out")
+        candidates = DeviceContextManager.candidate_tuples(context.name, tuple(ports))
+
+        # Historically successful paths first, otherwise keep context order
+        counts = self.path_stats.counts(context.name)
+        if counts:
+            candidates = sorted(candidates, key=lambda pair: -counts.get(pair[1], 0))
+
+        base = f"http://{device.address}:"
+        url_paths = {}
+        for port, path in candidates:
+            url_paths.setdefault(base + port + path, path)
+        return url_paths
+
+    def _try_snapshot_urls_parallel(
+        self,
+        urls: Iterable[str],
+        auth: Tuple[str, str, str],
+        headers: Dict[str, str],
+        probe_only: bool = False,
+    ) -> Optional[Tuple[str, bytes]]:
+        """
+        Probe snapshot URLs concurrently, returning the first working one.
+
+        With probe_only the data returned is just the image signature prefix.
+        """
+        urls = list(urls)
+        if not urls:
+            return None
+
+        found = threading.Event()
+
+        def probe(url: str) -> Optional[bytes]:
+            # Probes that start after a hit have nothing left to find
+            if found.is_set():
+                return None
+            return self._try_snapshot_url(url, auth, headers, probe_only)
+
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(len(urls), self.max_workers)
+        )
+        future_to_url = {executor.submit(probe, url): url for url in urls}
+
+        try:
+            for future in concurrent.futures.as_completed(future_to_url, timeout=10):
+                try:
+                    result = future.result()
+                    if result:
+                        found.set()
+                        return future_to_url[future], result
+                except Exception:
+                    continue
+        except concurrent.futures.TimeoutError:
+            Logger.warning("Parallel URL testing timed out")
+        finally:
+            # Drop queued probes and don't wait on in-flight ones
+            found.set()
+            for future in future_to_url:
+                future.cancel()
+            executor.shutdown(wait=False)
 
         return None
 
+    def _try_vendor_urls_parallel(
+        self, device: ONVIFDevice, context, cred
+    ) -> Optional[str]:
+        """Find a working vendor-specific snapshot URL by probing in parallel"""
+        url_paths = self._build_vendor_urls(device, context)
+        # Probes only check the image signature; the winner is downloaded after
+        hit = self._try_snapshot_urls_parallel(
+            url_paths, cred, self._snapshot_headers(), probe_only=True
+        )
+        if hit is None:
+            return None
+
+        url = hit[0]
+        self.path_stats.record(context.name, url_paths[url])
+        _cache_endpoint(device.address, "snapshot", url)
+        return url
+
+    def _get_media_service_url(
+        self, device_url: str, cred: Tuple[str, str, str]
+    ) -> str:
+        """Media service address from GetCapabilities, else the device URL"""
+        response = self._create_soap_request_iter(
+            device_url,
+            self.capability_detector._create_get_capabilities_message(),
+            cred,
+            CapabilityDetector.RESPONSE_ELEMENTS,
+        )
+        if response is not None:
+            media_url = self.capability_detector.get_media_service_url(response)
+            if media_url:
+                return media_url
+        return device_url
+
+    def _try_onvif_snapshot_uris(
+        self, device: ONVIFDevice, cred: Tuple[str, str, str]
+    ) -> Optional[str]:
+        """Find a working snapshot URI among those reported by GetSnapshotUri"""
+        for device_url in dict.fromkeys(device.urls or []):
+            media_url = self._get_media_service_url(device_url, cred)
+            uris = self._query_snapshot_uris(media_url, cred)
+            if not uris:
+                continue
+
+            hit = self._try_snapshot_urls_parallel(
+                uris, cred, self._snapshot_headers(), probe_only=True
+            )
+            if hit is not None:
+                _cache_endpoint(device.address, "snapshot", hit[0])
+                return hit[0]
+        return None
+
+    def _save_snapshot_from_url(
+        self, url: str, cred: Tuple[str, str, str], final_output: str
+    ) -> Optional[str]:
+        """Stream a snapshot straight to disk and convert it in place"""
+        temp_path = final_output + ".download"
+        if self._download_snapshot(url, cred, self._snapshot_headers(), temp_path):
+            return self.image_processor.save_image_file(temp_path, final_output)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+
     def _ensure_directory(self, directory: str) -> bool:
         """Ensure directory exists and is writable"""
         try:
@@ -91,10 +276,64 @@ class ONVIFSnapshot(ONVIFSnapshotBase, SnapshotInterface):
             Logger.error(f"Failed to create directory: {directory} - {str(e)}")
             return False
 
-    def capture_snapshot(
-        self, device: ONVIFDevice, output_dir: str = "snapshots"
+    def _snapshot_output_base(self, device: ONVIFDevice, output_dir: str) -> str:
+        """Output path (without extension) for a device snapshot"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return os.path.join(output_dir, f"snapshot_{device.address}_{timestamp}")
+
+    def _capture_rtsp_fallback(
+        self, device: ONVIFDevice, context, cred, final_output: str
     ) -> Optional[str]:
-        """Capture snapshot using device context for vendor-specific handling"""
+        """Capture a frame over RTSP and move it to the final location"""
+        Logger.info("Attempting RTSP stream capture...")
+
+        rtsp_urls = context.get_rtsp_urls(device.address, cred[0], cred[1])
+        cached_rtsp = _get_cached_endpoint(device.address, "rtsp")
+        if cached_rtsp in rtsp_urls:
+            rtsp_urls.remove(cached_rtsp)
+            rtsp_urls.insert(0, cached_rtsp)
+
+        # Create a temporary directory for intermediate files
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for rtsp_url in rtsp_urls:
+                temp_path = self.rtsp_handler.capture_rtsp_frame(
+                    rtsp_url,
+                    cred,
+                    os.path.join(temp_dir, "rtsp_frame"),
+                    self.image_processor.image_format,
+                    self.image_processor.quality,
+                )
+                if temp_path and os.path.exists(temp_path):
+                    try:
+                        # Move the temporary file to final location
+                        final_path = f"{final_output}.{self.image_format}"
+                        shutil.move(temp_path, final_path)
+                        _cache_endpoint(device.address, "rtsp", rtsp_url)
+                        Logger.success(
+                            f"Moved snapshot to final location: {final_path}"
+                        )
+                        return final_path
+                    except Exception as e:
+                        Logger.error(
+                            f"Error moving snapshot to final location: {str(e)}"
+                        )
+                        continue
+
+        return None
+
+    def _capture_with(
+        self,
+        device: ONVIFDevice,
+        output_dir: str,
+        find_vendor_url: Callable[..., Optional[str]],
+    ) -> Optional[str]:
+        """
+        Run the capture steps in order: cached URL, device-reported snapshot
+        URIs, vendor URL race, then RTSP.
+
+        find_vendor_url(device, context, cred) runs the vendor URL race, so the
+        threaded and aiohttp captures share every other step.
+        """
         if not device.valid_credentials:
             Logger.error("No valid credentials available")
             return None
@@ -104,58 +343,53 @@ class ONVIFSnapshot(ONVIFSnapshotBase, SnapshotInterface):
             return None
 
         cred = device.valid_credentials[0]
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        final_output = os.path.join(
-            output_dir, f"snapshot_{device.address}_{timestamp}"
-        )
+        final_output = self._snapshot_output_base(device, output_dir)
 
         try:
             context = DeviceContextManager.get_context(device.name)
             Logger.info(f"Using {context.name} device context...")
 
-            # Create a temporary directory for intermediate files
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Try vendor-specific URLs first
-                Logger.info("Trying vendor-specific snapshot URLs...")
-                snapshot_data = self._try_vendor_urls_parallel(device, context, cred)
-                if snapshot_data:
-                    # Process and save to final location
-                    return self.image_processor.save_image(snapshot_data, final_output)
-
-                # Try RTSP as fallback
-                Logger.info("Attempting RTSP stream capture...")
-
-                for rtsp_url in context.get_rtsp_urls(device.address, cred[0], cred[1]):
-                    temp_path = self.rtsp_handler.capture_rtsp_frame(
-                        rtsp_url,
-                        cred,
-                        os.path.join(temp_dir, "rtsp_frame"),
-                        self.image_processor.image_format,
-                        self.image_processor.quality,
-                    )
-                    if temp_path and os.path.exists(temp_path):
-                        try:
-                            # Move the temporary file to final location
-                            final_path = f"{final_output}.{self.image_format}"
-                            shutil.move(temp_path, final_path)
-                            Logger.success(
-                                f"Moved snapshot to final location: {final_path}"
-                            )
-                            return final_path
-                        except Exception as e:
-                            Logger.error(
-                                f"Error moving snapshot to final location: {str(e)}"
-                            )
-                            continue
-
-                Logger.error("Failed to capture snapshot through any method")
-                return None
+            # Start with the URL that worked last time
+            cached_url = _get_cached_endpoint(device.address, "snapshot")
+            if cached_url:
+                result = self._save_snapshot_from_url(cached_url, cred, final_output)
+                if result:
+                    return result
+                _drop_cached_endpoint(device.address, "snapshot")
+
+            # Ask the device for its snapshot URIs before guessing paths
+            Logger.info("Requesting snapshot URIs from the device...")
+            url = self._try_onvif_snapshot_uris(device, cred)
+            if url:
+                result = self._save_snapshot_from_url(url, cred, final_output)
+                if result:
+                    return result
+
+            # Fall back to vendor-specific URLs
+            Logger.info("Trying vendor-specific snapshot URLs...")
+            url = find_vendor_url(device, context, cred)
+            if url:
+                result = self._save_snapshot_from_url(url, cred, final_output)
+                if result:
+                    return result
+
+            # Try RTSP as fallback
+            result = self._capture_rtsp_fallback(device, context, cred, final_output)
+            if result:
+                return result
+
+            Logger.error("Failed to capture snapshot through any method")
+            return None
 
         except Exception as e:
             Logger.error(f"Error capturing snapshot: {str(e)}")
             return None
-        finally:
-            self.session.close()
+
+    def capture_snapshot(
+        self, device: ONVIFDevice, output_dir: str = "snapshots"
+    ) -> Optional[str]:
+        """Capture snapshot using device context for vendor-specific handling"""
+        return self._capture_with(device, output_dir, self._try_vendor_urls_parallel)
 
     def verify_ffmpeg(self) -> bool:
         """Verify ffmpeg availability"""
@@ -1,17 +1,38 @@
-import xml.etree.ElementTree as ET
 from typing import Dict, List, Optional
 from urllib.parse import urlparse
+from xml.sax.saxutils import escape
+
+from lxml import etree
 
 from ..utils import Logger
 
+_PROFILE_NAMESPACES = {
+    "trt": "http://www.onvif.org/ver10/media/wsdl",
+    "tt": "http://www.onvif.org/ver10/schema",
+    "tr2": "http://www.onvif.org/ver20/media/wsdl",
+}
 
-class MediaProfileHandler:
-    def __init__(self, namespaces: Dict[str, str]):
-        self._namespaces = namespaces
+# Compiled once and tried in order; namespaced lookups first (matched by tag
+# rather than a local-name() comparison per node), then namespace-agnostic
+# fallbacks for vendors using other namespaces
+_PROFILE_XPATHS = tuple(
+    etree.XPath(path, namespaces=_PROFILE_NAMESPACES)
+    for path in (
+        ".//trt:Profiles|.//tr2:Profiles|.//tt:Profiles",
+        ".//*[local-name()='Profiles']",
+        ".//*[local-name()='Profile']",
+    )
+)
+_URI_XPATHS = tuple(
+    etree.XPath(path, namespaces=_PROFILE_NAMESPACES)
+    for path in (
+        ".//tt:Uri/text()|.//tr2:Uri/text()",
+        ".//*[local-name()='Uri']/text()",
+    )
+)
 
-    def _create_get_stream_uri_message(self, profile_token: str) -> str:
-        """Create SOAP message for GetStreamUri request"""
-        return f"""<?xml version="1.0" encoding="UTF-8"?>
+# Request body split around the escaped profile token
+_GET_STREAM_URI_PREFIX = b"""<?xml version="1.0" encoding="UTF-8"?>
 <s:Envelope xmlns:s="http://www.w3.org/2003/05/soap-envelope">
     <s:Body>
         <GetStreamUri xmlns="http://www.onvif.org/ver10/media/wsdl">
@@ -21,22 +42,38 @@ class MediaProfileHandler:
                     <Protocol>RTSP</Protocol>
                 </Transport>
             </StreamSetup>
-            <ProfileToken>{profile_token}</ProfileToken>
+            <ProfileToken>"""
+_GET_STREAM_URI_SUFFIX = b"""</ProfileToken>
         </GetStreamUri>
     </s:Body>
 </s:Envelope>"""
 
-    def get_media_profiles(self, soap_response: ET.Element) -> List[Dict[str, str]]:
+
+class MediaProfileHandler:
+    # Elements to keep when stream-parsing responses with
+    # ONVIFSnapshotBase._create_soap_request_iter; profile lists need the whole
+    # response read, so pass stop_early=False with PROFILE_ELEMENTS
+    PROFILE_ELEMENTS = frozenset({"Profiles", "Profile"})
+    URI_ELEMENTS = frozenset({"Uri"})
+
+    def _create_get_stream_uri_message(self, profile_token: str) -> bytes:
+        """Create SOAP message for GetStreamUri request"""
+        return (
+            _GET_STREAM_URI_PREFIX
+            + escape(profile_token).encode("utf-8")
+            + _GET_STREAM_URI_SUFFIX
+        )
+
+    def get_media_profiles(self, soap_response: etree._Element) -> List[Dict[str, str]]:
         """Extract media profiles from SOAP response"""
         profiles = []
         try:
             # Try multiple approaches to find profiles
-            profile_elements = (
-                soap_response.findall(".//trt:Profiles", self._namespaces)
-                or soap_response.findall(".//tt:Profiles", self._namespaces)
-                or soap_response.findall(".//*[local-name()='Profiles']")
-                or soap_response.findall(".//*[local-name()='Profile']")
-            )
+            profile_elements = []
+            for xpath in _PROFILE_XPATHS:
+                profile_elements = xpath(soap_response)
+                if profile_elements:
+                    break
 
             for profile in profile_elements:
                 profile_info = {
@@ -52,12 +89,13 @@ class MediaProfileHandler:
 
         return profiles
 
-    def extract_uri_from_response(self, soap_response: ET.Element) -> Optional[str]:
+    def extract_uri_from_response(self, soap_response: etree._Element) -> Optional[str]:
         """Extract URI from SOAP response"""
         try:
-            uri_element = soap_response.find(".//*[local-name()='Uri']")
-            if uri_element is not None and uri_element.text:
-                return uri_element.text
+            for xpath in _URI_XPATHS:
+                for uri in xpath(soap_response):
+                    if uri:
+                        return str(uri)
         except Exception as e:
             Logger.debug(f"Error extracting URI from response: {str(e)}")
         return None
@@ -7,6 +7,19 @@ from onvifscout.snapshot.image import ImageProcessor
 
 from ..utils import Logger
 
+try:
+    import av
+except ImportError:  # pragma: no cover - optional dependency
+    av = None
+
+
+def _rtsp_timeout_option() -> str:
+    """Name of the RTSP socket timeout option for the linked libavformat"""
+    # FFmpeg 5 (libavformat 59) renamed stimeout to timeout; before that,
+    # timeout meant how long to wait for an incoming connection
+    version = av.library_versions.get("libavformat", (0,))
+    return "timeout" if version[0] >= 59 else "stimeout"
+
 
 class RTSPHandler:
     def __init__(
@@ -16,7 +29,9 @@ class RTSPHandler:
         self.image_processor = image_processor
 
     def verify_ffmpeg(self) -> bool:
-        """Verify that ffmpeg is available for RTSP capture"""
+        """Verify that ffmpeg (or PyAV) is available for RTSP capture"""
+        if av is not None:
+            return True
         try:
             subprocess.run(
                 ["ffmpeg", "-version"],
@@ -33,6 +48,36 @@ class RTSPHandler:
             Logger.warning(f"Error verifying ffmpeg: {str(e)}")
             return False
 
+    def _capture_with_pyav(
+        self, rtsp_url: str, output_file_path: str, image_format: str, quality: int
+    ) -> Optional[str]:
+        """Decode a single frame in-process with PyAV and save it"""
+        container = None
+        try:
+            container = av.open(
+                rtsp_url,
+                options={
+                    "rtsp_transport": "tcp",
+                    _rtsp_timeout_option(): str(int(self.timeout * 1_000_000)),
+                },
+                timeout=self.timeout,
+            )
+            for frame in container.decode(video=0):
+                image = frame.to_image()
+                if image_format.lower() == "png":
+                    image.save(output_file_path, "PNG", compress_level=6)
+                else:
+                    image.save(output_file_path, "JPEG", quality=quality)
+                Logger.success(f"RTSP frame captured: {output_file_path}")
+                return output_file_path
+            Logger.debug(f"No video frames decoded from {rtsp_url}")
+        except Exception as e:
+            Logger.debug(f"Error capturing RTSP frame with PyAV: {str(e)}")
+        finally:
+            if container is not None:
+                container.close()
+        return None
+
     def capture_rtsp_frame(
         self,
         rtsp_url: str,
@@ -51,6 +96,12 @@ class RTSPHandler:
                 parsed = urlparse(rtsp_url)
                 rtsp_url = f"rtsp://{auth[0]}:{auth[1]}@{parsed.hostname}:{parsed.port or 554}{parsed.path}"  # noqa: E501
 
+            # Decode in-process when PyAV is installed, avoiding an ffmpeg spawn
+            if av is not None:
+                return self._capture_with_pyav(
+                    rtsp_url, output_file_path, image_format, quality
+                )
+
             # Enhanced ffmpeg command with better options
             cmd = [
                 "ffmpeg",
@@ -0,0 +1,64 @@
+import json
+import threading
+from pathlib import Path
+from typing import Dict
+
+from ..utils import Logger
+
+
+class PathStats:
+    """Per-vendor snapshot path success counters, used to order path probes"""
+
+    def __init__(self, config_dir: str = None):
+        if config_dir:
+            self.config_dir = Path(config_dir)
+        else:
+            self.config_dir = Path.home() / ".onvifscout"
+
+        self.stats_file = self.config_dir / "path_stats.json"
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stats = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, int]]:
+        """Load saved counters, starting empty if the file is missing or invalid"""
+        try:
+            if self.stats_file.exists():
+                with open(self.stats_file, "r") as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    return data
+        except Exception as e:
+            Logger.debug(f"Failed to load path stats: {str(e)}")
+        return {}
+
+    def record(self, vendor: str, path: str) -> None:
+        """Count a successful snapshot path for a vendor"""
+        with self._lock:
+            counts = self._stats.setdefault(vendor.lower(), {})
+            counts[path] = counts.get(path, 0) + 1
+            self._dirty = True
+
+    def counts(self, vendor: str) -> Dict[str, int]:
+        """Get a copy of the success counts recorded for a vendor"""
+        with self._lock:
+            return dict(self._stats.get(vendor.lower(), {}))
+
+    def flush(self) -> None:
+        """Persist counters if they changed since the last flush"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(self._stats, indent=2)
+            self._dirty = False
+
+        temp_file = self.stats_file.with_suffix(".tmp")
+        try:
+            self.config_dir.mkdir(parents=True, exist_ok=True)
+            with open(temp_file, "w") as f:
+                f.write(data)
+            temp_file.replace(self.stats_file)
+        except Exception as e:
+            Logger.debug(f"Failed to save path stats: {str(e)}")
+            if temp_file.exists():
+                temp_file.unlink()
@@ -1,6 +1,7 @@
 import sys
 from datetime import datetime
 
+import urllib3
 from colorama import Back, Fore, Style
 
 
@@ -157,6 +158,22 @@ class Logger:
         Logger.raw(separator)
 
 
+_insecure_warnings_disabled = False
+
+
+def disable_insecure_warnings() -> None:
+    """
+    Silence urllib3's InsecureRequestWarning for unverified device requests.
+
+    Called when a client is created rather than at import, so importing the
+    package leaves the caller's warning filters alone.
+    """
+    global _insecure_warnings_disabled
+    if not _insecure_warnings_disabled:
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        _insecure_warnings_disabled = True
+
+
 def print_banner():
     """Print the application banner"""
     print(Logger.banner)
@@ -21,7 +21,13 @@ setup(
     install_requires=[
         "colorama>=0.4.6",
         "requests>=2.32.3",
+        "lxml>=4.9",
     ],
+    extras_require={
+        "fast": ["orjson>=3.8"],
+        "async": ["aiohttp>=3.9"],
+        "rtsp": ["av>=10.0"],
+    },
     entry_points={
         "console_scripts": [
             "onvifscout=onvifscout.main:main",
@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+
+from onvifscout.device_manager.manager import DeviceManager
+from onvifscout.models import ONVIFDevice
+
+
+class DeviceManagerRoundTripTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.config_dir = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _device(self) -> ONVIFDevice:
+        return ONVIFDevice(
+            address="192.168.1.10",
+            urls=["http://192.168.1.10/onvif/device_service"],
+            types=["NetworkVideoTransmitter"],
+            name="Camera",
+            valid_credentials=[("admin", "12345", "Digest")],
+        )
+
+    def test_saved_device_is_unchanged_after_reload(self):
+        manager = DeviceManager(self.config_dir)
+        self.assertTrue(manager.add_device(self._device(), flush_immediately=True))
+
+        reloaded = DeviceManager(self.config_dir)
+        device_data = reloaded._serialize_device(self._device())
+        self.assertTrue(reloaded._is_unchanged(device_data))
+
+    def test_readding_unchanged_device_only_updates_last_seen(self):
+        DeviceManager(self.config_dir).add_device(
+            self._device(), flush_immediately=True
+        )
+
+        reloaded = DeviceManager(self.config_dir)
+        self.assertTrue(reloaded.add_device(self._device(), flush_immediately=True))
+
+        with open(reloaded.journal_file, "rb") as f:
+            ops = [line for line in f.read().splitlines() if line]
+        self.assertEqual(len(ops), 2)
+        self.assertIn(b'"upd"', ops[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()